@@ -0,0 +1,113 @@
+r"""Time the stages of pollscore on synthetic courses.
+
+Each stage of :class:`pollscore.pollscore.Poll` is run in dependency order, so that every
+measurement covers the work of that stage only. Runtime is the best of ``--repeat`` runs;
+peak memory is measured with tracemalloc in a separate run, since tracing slows down execution.
+
+Example::
+
+    python benchmarks/stages.py --size lecture --format old
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import contextlib
+from io import StringIO
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic import generate_course
+from pollscore.pollscore import Poll
+
+#(students, sessions, questions) for a range of course sizes
+sizes={
+    "seminar": (20,12,3),
+    "lecture": (300,40,5),
+    "large": (1500,80,6),
+    "mooc": (20000,100,8),
+}
+
+#the submission is computed from the responses in long format; the wide response and score
+#tables come last, since they are only needed for interactive analysis
+stages=[
+    ("parse", lambda P: P.parsed_reports()),
+    ("sessions", lambda P: P.session_report()),
+    ("scorers", lambda P: P.scorers()),
+    ("match", lambda P: P.match()),
+    ("score totals", lambda P: P.score_totals()),
+    ("roster table", lambda P: P.roster_table()),
+    ("write submission", lambda P: P.write_submission()),
+    ("unstack", lambda P: P.response_table()),
+    ("score tables", lambda P: P.score_tables()),
+]
+
+def run_stages(directory,memory=False,compact=False):
+    r"""Run all stages on the course in ``directory``; return a dictionary of seconds, or of peak bytes if ``memory``."""
+    cwd=os.getcwd()
+    results={}
+    try:
+        os.chdir(directory)
+        with contextlib.redirect_stdout(StringIO()):
+            P=Poll("config",use_cache=False,compact=compact)
+            for name,stage in stages:
+                if memory:
+                    tracemalloc.start()
+                    stage(P)
+                    results[name]=tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                else:
+                    t=time.perf_counter()
+                    stage(P)
+                    results[name]=time.perf_counter()-t
+    finally:
+        os.chdir(cwd)
+    return results
+
+def benchmark(directory,repeat=3,memory=True,compact=False):
+    r"""List of (stage, seconds, peak bytes) for the course in ``directory``."""
+    timings=[run_stages(directory,compact=compact) for _ in range(repeat)]
+    peaks=run_stages(directory,memory=True,compact=compact) if memory else {}
+    return [(name,min(t[name] for t in timings),peaks.get(name)) for name,_ in stages]
+
+def main():
+    import argparse
+    parser=argparse.ArgumentParser(description="Time the stages of pollscore on a synthetic course.")
+    parser.add_argument("--size", choices=sorted(sizes), default="lecture", help="preset course size (default 'lecture')")
+    parser.add_argument("--students", type=int, help="override the number of students of the preset")
+    parser.add_argument("--sessions", type=int, help="override the number of sessions of the preset")
+    parser.add_argument("--questions", type=int, help="override the number of questions per session of the preset")
+    parser.add_argument("--format", choices=["old","new"], default="new", help="Zoom report format (before or after Sept. 2021)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--alias-rate", type=float, default=0.05)
+    parser.add_argument("--duplicates", choices=["first","last","latest-by-time","best-score"], default="latest-by-time",
+        help="policy for resolving duplicate responses (default 'latest-by-time')")
+    parser.add_argument("--compact", action="store_true", help="benchmark Poll in compact mode")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs (default 3)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement")
+    parser.add_argument("--json", type=str, help="also write the results to this file")
+    args=parser.parse_args()
+
+    students,sessions,questions=sizes[args.size]
+    students=args.students or students
+    sessions=args.sessions or sessions
+    questions=args.questions or questions
+    with tempfile.TemporaryDirectory() as directory:
+        rows=generate_course(directory,students,sessions,questions,args.format,
+            duplicate_rate=args.duplicate_rate,alias_rate=args.alias_rate,duplicates=args.duplicates)
+        print("{} students, {} sessions, {} questions per session, {} responses ({} format)".format(
+            students,sessions,questions,rows,args.format))
+        results=benchmark(directory,args.repeat,not args.no_memory,args.compact)
+    print("{:<18} {:>10} {:>12}".format("stage","seconds","peak MB"))
+    for name,seconds,peak in results:
+        print("{:<18} {:>10.4f} {:>12}".format(name,seconds,"" if peak is None else "{:.1f}".format(peak/2**20)))
+    print("{:<18} {:>10.4f}".format("total",sum(r[1] for r in results)))
+    if args.json:
+        with open(args.json,"w") as f:
+            json.dump({"students":students,"sessions":sessions,"questions":questions,"responses":rows,
+                "format":args.format,"compact":args.compact,"duplicate_rate":args.duplicate_rate,"duplicates":args.duplicates,
+                "stages":[{"stage":n,"seconds":s,"peak_bytes":p} for n,s,p in results]},f,indent=1)
+
+if __name__ == "__main__":
+    main()
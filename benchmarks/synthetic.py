@@ -0,0 +1,164 @@
+r"""Generate synthetic courses for benchmarking pollscore.
+
+A course consists of a ``config`` file, a roster, and poll reports in either the pre Sept. 2021
+Zoom format (one table of (question,answer) pairs) or the post Sept. 2021 format (one subtable
+per question). Sizes and the rates of duplicate responses and of responses from aliased emails
+are configurable. Run as a script to write a course into a directory.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+first_names=["Ada","Bo","Cy","Di","Ed","Flo","Gus","Hal","Ida","Jo","Kim","Lou","Max","Ned","Oda","Pat"]
+last_names=["Abbot","Baird","Chen","Diaz","Evans","Fox","Gray","Hull","Ives","Jain","Kerr","Lund"]
+answer_letters=np.array(list("ABCDE"),dtype=object)
+time_format="%b %d %Y, %H:%M:%S"
+
+def make_roster(rng,students,domain):
+    r"""Roster table and list of login ids for the given number of students."""
+    letters=np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    logins=[]
+    seen=set()
+    while len(logins) < students:
+        login="".join(rng.choice(letters,5))+"{:03d}".format(rng.integers(1000))
+        if login not in seen:
+            seen.add(login)
+            logins.append(login)
+    first=rng.choice(first_names,students)
+    last=rng.choice(last_names,students)
+    roster=pd.DataFrame({
+        "Student":["{}, {}".format(l,f) for f,l in zip(first,last)],
+        "ID":rng.integers(10000,99999,students),
+        "SIS User ID":rng.integers(1000000,3999999,students),
+        "SIS Login ID":logins,
+        "Section":"SYN100 D100",
+    })
+    names=["{} {}".format(f,l) for f,l in zip(first,last)]
+    return roster,names
+
+def session_responses(rng,start,questions,emails,names,participation,duplicate_rate):
+    r"""Table of responses to one session, with columns "name", "email", "time", "question", "answer"."""
+    tables=[]
+    for q in range(questions):
+        responding=np.flatnonzero(rng.random(len(emails)) < participation)
+        seconds=q*300+rng.integers(0,300,len(responding))
+        tables.append(pd.DataFrame({
+            "name":names[responding],
+            "email":emails[responding],
+            "time":start+pd.to_timedelta(seconds,unit="s"),
+            "question":"Q{}".format(q+1),
+            "answer":rng.choice(answer_letters,len(responding)),
+        }))
+    table=pd.concat(tables,ignore_index=True)
+    if duplicate_rate > 0:
+        dup=table[rng.random(len(table)) < duplicate_rate].copy()
+        dup["time"]=dup["time"]+pd.to_timedelta(rng.integers(1,60,len(dup)),unit="s")
+        dup["answer"]=rng.choice(answer_letters,len(dup))
+        table=pd.concat([table,dup],ignore_index=True)
+    return table.sort_values("time",kind="mergesort",ignore_index=True)
+
+def write_report(filename,table,format):
+    r"""Write a response table as a Zoom poll report in the "old" or "new" format."""
+    table=table.assign(time=table["time"].dt.strftime(time_format))
+    with open(filename,"w",newline="") as f:
+        if format == "old":
+            f.write("#,User Name,User Email,Submitted Date/Time,\n")
+            out=table[["name","email","time","question","answer"]]
+            out.insert(0,"#",np.arange(1,len(out)+1))
+            out.to_csv(f,header=False,index=False)
+        else:
+            f.write("Poll Report\n")
+            f.write('Report Generated:,"{}"\n'.format(table["time"].iloc[0] if len(table) else ""))
+            f.write("Topic,Webinar ID,Actual Start Time\nSynthetic course,0,\n\nPoll Details\n")
+            for question,sub in table.groupby("question",sort=True):
+                f.write("#,User Name,User Email,Submitted Date/Time,{}\n".format(question))
+                out=sub[["name","email","time","answer"]]
+                out.insert(0,"#",np.arange(1,len(out)+1))
+                out.to_csv(f,header=False,index=False)
+
+def generate_course(directory,students=100,sessions=10,questions=4,format="new",
+        participation=0.8,duplicate_rate=0.0,alias_rate=0.0,unconfigured_rate=0.1,seed=0,
+        duplicates="latest-by-time"):
+    r"""Write a synthetic course into ``directory`` and return the number of responses written.
+
+    Every session is a 50 minute lecture on its own day, with ``questions`` questions. Each student
+    answers each question with probability ``participation``. A fraction ``duplicate_rate`` of the
+    responses is submitted a second time, a fraction ``alias_rate`` of the students responds from
+    an email that needs an alias to be matched, and a fraction ``unconfigured_rate`` of the sessions
+    is left out of the configuration. If there are duplicate responses, the configuration resolves
+    them by the policy ``duplicates`` and lists them in a report inside ``directory``.
+    """
+    rng=np.random.default_rng(seed)
+    os.makedirs(directory,exist_ok=True)
+    domain="@synthetic.edu"
+    roster,names=make_roster(rng,students,domain)
+    logins=roster["SIS Login ID"].to_numpy(dtype=object)
+    emails=np.array([l+domain for l in logins],dtype=object)
+    aliased=np.flatnonzero(rng.random(students) < alias_rate)
+    aliases={}
+    for i in aliased:
+        alias="{}.{}@other.com".format(names[i].replace(" ","."),logins[i])
+        emails[i]=alias
+        aliases[alias]=logins[i]
+    names=np.array(names,dtype=object)
+
+    header=pd.DataFrame([["",None,None,"",""],["    Points Possible",None,None,"",""]],columns=roster.columns)
+    pd.concat([header,roster],ignore_index=True).to_csv(os.path.join(directory,"roster.csv"),index=False)
+
+    config=[
+        'pollreports=["PollReport-*.csv"]',
+        'roster="roster.csv"',
+        'upload="canvas_submission.csv"',
+        'participation_column="Poll Participation"',
+        'correctness_column="Poll Answer Score"',
+        'total_column="Poll Total"',
+        'domain="{}"'.format(domain),
+        'aliases={!r}'.format(aliases),
+        'participation=2',
+        'correct=1',
+    ]
+    if duplicate_rate > 0:
+        config.append('duplicates="{}"'.format(duplicates))
+        config.append('duplicate_report="duplicate_responses.csv"')
+    first_day=pd.Timestamp("2020-09-08 10:00")
+    rows=0
+    for s in range(sessions):
+        start=first_day+pd.Timedelta(days=s)
+        table=session_responses(rng,start,questions,emails,names,participation,duplicate_rate)
+        write_report(os.path.join(directory,"PollReport-{:04d}.csv".format(s+1)),table,format)
+        rows+=len(table)
+        if rng.random() < unconfigured_rate:
+            continue
+        correct=rng.choice(answer_letters,questions)
+        if s % 2:
+            config.append('session("{}; 50min","{}")'.format(start.strftime("%Y-%m-%d %H:%M"),",".join(correct)))
+        else:
+            config.append('session("{}; 50min")'.format(start.strftime("%Y-%m-%d %H:%M")))
+            for q,a in enumerate(correct):
+                config.append('question("Q{}","{}")'.format(q+1,a))
+    with open(os.path.join(directory,"config"),"w") as f:
+        f.write("\n".join(config)+"\n")
+    return rows
+
+def main():
+    import argparse
+    parser=argparse.ArgumentParser(description="Write a synthetic course for benchmarking pollscore.")
+    parser.add_argument("directory", type=str, help="directory to write the course into")
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--format", choices=["old","new"], default="new", help="Zoom report format (before or after Sept. 2021)")
+    parser.add_argument("--participation", type=float, default=0.8)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--alias-rate", type=float, default=0.0)
+    parser.add_argument("--unconfigured-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duplicates", choices=["first","last","latest-by-time","best-score"], default="latest-by-time",
+        help="policy for resolving duplicate responses (default 'latest-by-time')")
+    args=parser.parse_args()
+    rows=generate_course(args.directory,args.students,args.sessions,args.questions,args.format,
+        args.participation,args.duplicate_rate,args.alias_rate,args.unconfigured_rate,args.seed,args.duplicates)
+    print("Wrote {} responses to {}".format(rows,args.directory))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+r"""Canonical forms of poll answers, so that answers differing in inessential ways are scored alike.
+
+Rules are given by name, or as functions taking an answer string and returning its canonical
+form. The named rules are:
+
+ * "case" - ignore case
+ * "whitespace" - ignore leading and trailing whitespace, and treat runs of whitespace as a single space
+ * "order" - ignore the order of the choices in a multiple selection such as "A;B"
+"""
+import re
+import functools
+
+whitespace_regex=re.compile(r"\s+")
+
+def fold_case(answer,separator):
+    return answer.casefold()
+
+def collapse_whitespace(answer,separator):
+    return whitespace_regex.sub(" ",answer).strip()
+
+def sort_choices(answer,separator):
+    return separator.join(sorted(c.strip() for c in answer.split(separator) if c.strip()))
+
+rules={"case":fold_case,"whitespace":collapse_whitespace,"order":sort_choices}
+
+class Canonicalizer:
+    r"""Maps answers to canonical forms by applying a list of rules in order.
+
+    Canonical forms are memoized, so each distinct answer is processed only once, however
+    often it occurs. Choices in multiple selections are separated by ``separator``.
+    Answers that are not strings are left as they are.
+    """
+    def __init__(self,names,separator=";"):
+        self.rules=[]
+        for name in names:
+            if callable(name):
+                self.rules.append(name)
+            elif name in rules:
+                self.rules.append(functools.partial(rules[name],separator=separator))
+            else:
+                raise ValueError("Unknown answer normalization '{}'; use one of {} or a function".format(name,", ".join(rules)))
+        self.separator=separator
+        self._canonical={}
+
+    def __call__(self,answer):
+        try:
+            return self._canonical[answer]
+        except KeyError:
+            pass
+        canonical=answer
+        if isinstance(canonical,str):
+            for rule in self.rules:
+                canonical=rule(canonical)
+        self._canonical[answer]=canonical
+        return canonical
+
+    def map(self,answers):
+        r"""List of the canonical forms of ``answers``."""
+        return [self(a) for a in answers]
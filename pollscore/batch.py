@@ -0,0 +1,108 @@
+import os
+import sys
+import contextlib
+from io import StringIO
+from concurrent.futures import ProcessPoolExecutor
+
+def score_course(config,use_cache=True,compact=False,delta=False):
+    r"""Score the course configured in the file ``config`` and write its submission file.
+
+    Relative paths in the configuration are taken relative to the directory of the
+    configuration file. Everything printed during processing is captured rather than
+    shown. Returns a dictionary with entries "config", "messages" (captured output lines),
+    "maxscores", "upload", and "error" (None if processing succeeded).
+    """
+    from pollscore.pollscore import Poll
+    directory,filename=os.path.split(os.path.abspath(config))
+    result={"config":config,"maxscores":{},"upload":None,"error":None}
+    output=StringIO()
+    cwd=os.getcwd()
+    try:
+        os.chdir(directory)
+        with contextlib.redirect_stdout(output):
+            P=Poll(filename,use_cache=use_cache,compact=compact)
+            P.write_submission(delta)
+            result["maxscores"]=P.max_scores()
+        result["upload"]=os.path.join(directory,P.uploadfile)
+    except Exception as E:
+        result["error"]="{}: {}".format(type(E).__name__,E)
+    finally:
+        os.chdir(cwd)
+    result["messages"]=output.getvalue().splitlines()
+    return result
+
+def config_path(path):
+    r"""Configuration file for a command line argument, which may also be a course directory."""
+    if os.path.isdir(path):
+        return os.path.join(path,"config")
+    return path
+
+def read_manifest(filename):
+    r"""Configuration files listed in a manifest file, one per line (or course directories containing them).
+
+    Empty lines and lines starting with "#" are ignored. Relative paths are taken
+    relative to the directory of the manifest.
+    """
+    directory=os.path.dirname(filename)
+    configs=[]
+    with open(filename) as f:
+        for line in f:
+            line=line.strip()
+            if line and not line.startswith("#"):
+                configs.append(config_path(os.path.join(directory,line)))
+    return configs
+
+def score_courses(configs,jobs=1,use_cache=True,compact=False,delta=False):
+    r"""Score the courses for the given configuration files, using ``jobs`` processes.
+
+    Returns the results of :func:`score_course` in the order of ``configs``.
+    """
+    jobs=min(jobs if jobs > 0 else (os.cpu_count() or 1),len(configs))
+    arguments=(configs,[use_cache]*len(configs),[compact]*len(configs),[delta]*len(configs))
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            return list(pool.map(score_course,*arguments))
+    else:
+        return list(map(score_course,*arguments))
+
+def print_summary(results):
+    for r in results:
+        print("-----------\n{}\n-----------".format(r["config"]))
+        for line in r["messages"]:
+            print(line)
+        if r["error"]:
+            print("FAILED: {}".format(r["error"]))
+        else:
+            for col,score in r["maxscores"].items():
+                print("Maximum {}: {}".format(col,score))
+            print("Report in {} is ready for upload".format(r["upload"]))
+    failed=[r["config"] for r in results if r["error"]]
+    print("-----------\nProcessed {} courses, {} failed{}".format(
+        len(results),len(failed),": {}".format(failed) if failed else ""))
+
+def main(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score Zoom poll reports for many courses in one run.")
+    parser.add_argument("configs", metavar="CONFIG", type=str, nargs='*',
+        help = "config files of the courses to process, or the course directories containing them.")
+    parser.add_argument("-m","--manifest", type=str, action="append", default=[],
+        help = "file listing config files to process, one per line")
+    parser.add_argument("-j","--jobs", type=int, default=1, help = "number of courses processed in parallel (default 1; 0 for one per CPU)")
+    parser.add_argument("--compact", action="store_true", help = "store responses as categoricals to reduce memory use")
+    parser.add_argument("--delta", action="store_true", help = "only write students whose scores changed since the last committed snapshot")
+    parser.add_argument("--no-cache", action="store_true", help = "parse all report files, bypassing the cache of parsed reports")
+    args = parser.parse_args(args or None)
+
+    configs=[config_path(c) for c in args.configs]
+    for m in args.manifest:
+        configs.extend(read_manifest(m))
+    if not configs:
+        parser.error("no courses specified")
+    results=score_courses(configs,jobs=args.jobs,use_cache=not args.no_cache,compact=args.compact,delta=args.delta)
+    print_summary(results)
+    if any(r["error"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
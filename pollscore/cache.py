@@ -0,0 +1,87 @@
+import os
+import hashlib
+import pickle
+import pandas as pd
+
+#bump whenever the format of the parsed report tables changes, so that stale entries are not used
+CACHE_VERSION=1
+
+class ReportCache:
+    r"""On-disk cache of parsed poll report tables.
+
+    Parsed tables are stored in pickled form under the content hash of the report file and
+    the pandas version, since pickles of pandas objects need not load in other versions.
+    An index records path, size, and modification time of the reports seen before, so
+    that unchanged reports are recognized without hashing their contents again.
+    """
+    def __init__(self,directory):
+        self.directory=directory
+        self.indexfile=os.path.join(directory,"index-v{}.pickle".format(CACHE_VERSION))
+        self._index=None
+        self._modified=False
+
+    def index(self):
+        r"""Dictionary with entries <path>:(<size>,<mtime>,<content hash>)"""
+        if self._index is None:
+            try:
+                with open(self.indexfile,"rb") as f:
+                    self._index=pickle.load(f)
+            except Exception:
+                #an unreadable index only means that report files are hashed again
+                self._index={}
+        return self._index
+
+    def digest(self,filename):
+        r"""Content hash of a report file, using the index if the file is unchanged"""
+        path=os.path.abspath(filename)
+        st=os.stat(path)
+        entry=self.index().get(path)
+        if entry is not None and entry[:2] == (st.st_size,st.st_mtime_ns):
+            return entry[2]
+        with open(path,"rb") as f:
+            digest=hashlib.sha1(f.read()).hexdigest()
+        self.index()[path]=(st.st_size,st.st_mtime_ns,digest)
+        self._modified=True
+        return digest
+
+    def tablefile(self,digest):
+        return os.path.join(self.directory,"{}-v{}-pandas{}.pickle".format(digest,CACHE_VERSION,pd.__version__))
+
+    def get(self,filename):
+        r"""Return the cached table for the current content of a report file, or None if there is none.
+
+        A cached table that cannot be loaded, for whatever reason, counts as missing, so that the
+        report is parsed again.
+        """
+        try:
+            return pd.read_pickle(self.tablefile(self.digest(filename)))
+        except Exception:
+            return None
+
+    def put(self,filename,table):
+        r"""Store the parsed table for the current content of a report file."""
+        os.makedirs(self.directory,exist_ok=True)
+        tablefile=self.tablefile(self.digest(filename))
+        tmp=tablefile+".tmp"
+        table.to_pickle(tmp)
+        os.replace(tmp,tablefile)
+
+    def save(self):
+        r"""Write the index back to disk if it has changed."""
+        if not self._modified:
+            return
+        os.makedirs(self.directory,exist_ok=True)
+        tmp=self.indexfile+".tmp"
+        with open(tmp,"wb") as f:
+            pickle.dump(self._index,f)
+        os.replace(tmp,self.indexfile)
+        self._modified=False
+
+    def clear(self):
+        r"""Remove all cached tables and the index."""
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".pickle") or name.endswith(".tmp"):
+                    os.remove(os.path.join(self.directory,name))
+        self._index={}
+        self._modified=False
@@ -0,0 +1,87 @@
+r"""Command line interface of pollscore.
+
+Only the standard library and the configuration module are imported up front, so that
+``--help`` and ``--check-config`` return without loading pandas.
+"""
+import sys
+from pollscore import confmod
+
+def main(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score Zoom poll reports for upload to a course management system.")
+    parser.add_argument("files", metavar="FILE", type=str, nargs='*',
+        help = "if specified, process given report files instead of configured ones.")
+    parser.add_argument("-c","--config", type=str, default='config', help = "config file (default 'config')")
+    parser.add_argument("-j","--jobs", type=int, default=1, help = "number of processes for parsing report files (default 1; 0 for one per CPU)")
+    parser.add_argument("--compact", action="store_true", help = "store responses as categoricals to reduce memory use")
+    parser.add_argument("--watch", action="store_true", help = "keep running, and rescore whenever report files are added or changed")
+    parser.add_argument("--interval", type=float, default=5, help = "seconds between checks for changed report files in watch mode (default 5)")
+    parser.add_argument("--profile", type=str, metavar="FILE", help = "write the time used by the processing stages as JSON to FILE")
+    parser.add_argument("--profile-memory", action="store_true", help = "with --profile, also record peak memory use of the stages; tracing memory roughly doubles the time of some stages, so the times are less reliable")
+    parser.add_argument("--delta", action="store_true", help = "only write students whose scores changed since the last committed snapshot")
+    parser.add_argument("--commit-snapshot", action="store_true", help = "only record the submission file as uploaded in the snapshot, without processing reports; run this after each upload of a --delta submission")
+    parser.add_argument("--no-cache", action="store_true", help = "parse all report files, bypassing the cache of parsed reports")
+    parser.add_argument("--clear-cache", action="store_true", help = "empty the cache of parsed reports before processing")
+    parser.add_argument("--check-config", action="store_true", help = "only check the config file for errors, without processing reports")
+    args = parser.parse_args()
+    if args.profile_memory and not args.profile:
+        parser.error("--profile-memory requires --profile")
+
+    if args.check_config:
+        print('Checking poll configuration from file "{}"'.format(args.config))
+        problems = confmod.check(args.config)
+        for problem in problems:
+            print("Problem:",problem)
+        if problems:
+            sys.exit(1)
+        print("Configuration has {} sessions and no problems".format(len(confmod.sessions)))
+        return
+
+    #importing pandas takes most of the start-up time, so only do it once reports are processed
+    from pollscore.pollscore import Poll
+    from pollscore.instrument import Profiler
+    from pollscore.cache import ReportCache
+
+    print("args:",args)
+    print("-----------\nPOLL SCORE PROCESSING\n-----------");
+    print('Processing poll configuration from file "{}"'.format(args.config))
+    profiler = Profiler(memory=args.profile_memory) if args.profile else None
+    P = Poll(args.config,use_cache=not args.no_cache,jobs=args.jobs,compact=args.compact,profiler=profiler)
+    if args.commit_snapshot:
+        P.commit_snapshot()
+        return
+    if args.clear_cache:
+        #with --no-cache, the Poll has no cache of its own, but the configured one is still cleared
+        cache = P.cache if P.cache is not None else (ReportCache(confmod.cache) if confmod.cache else None)
+        if cache is None:
+            print("No cache of parsed reports configured, so there is nothing to clear")
+        else:
+            print('Clearing cache of parsed reports in "{}"'.format(cache.directory))
+            cache.clear()
+    if args.files:
+        print("Report files overridden by command line argument. Working with: {}".format(args.files))
+        P.reportfiles = args.files
+    else:
+        print("Configured report files: {}".format(P.reportfiles))
+    print("Configured sessions: {}".format(sorted(P.config_sessions.keys())))
+    print("-----------\nRESPONSE PROCESSING\n-----------");
+    P.session_report()
+    print("-----------\nSCORING PROCESSING\n-----------");
+    P.scorers()
+    print("-----------\nMATCHING ROSTER\n-----------");
+    P.matched_roster()
+    print("-----------\nWRITING SCORE FILE\n-----------");
+    P.write_submission(args.delta)
+    for col,score in P.max_scores().items():
+        print("Maximum {}: {}".format(col,score))
+    print("Report in {} is ready for upload".format(P.uploadfile))
+    if profiler is not None:
+        profiler.write(args.profile)
+        print("Profile of processing stages written to {}".format(args.profile))
+    if args.watch:
+        print("-----------\nWATCHING FOR REPORT CHANGES\n-----------");
+        P.watch(args.interval,patterns=not args.files,delta=args.delta)
+
+if __name__ == "__main__":
+    main()
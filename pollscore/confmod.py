@@ -1,15 +1,36 @@
 from pollscore.period import Period
-aliases={}
-sessions={}
-participation=0
-correct=0
-_current_session=None
-
-participation_column=None
-correctness_column=None
-total_column=None
-ignore_responses=[]
-ignore_roster=[]
+from pollscore.answers import Canonicalizer
+#settings without a default value
+required=["pollreports","roster","upload","domain"]
+#ways of handling multiple responses from a participant to the same question
+duplicate_policies=("error","first","last","latest-by-time","best-score")
+
+def reset():
+    r"""Restore the default settings, discarding anything set by previously executed configurations."""
+    global aliases,sessions,participation,correct,_current_session
+    global participation_column,correctness_column,total_column,ignore_responses,ignore_roster,cache,snapshot
+    global duplicates,duplicate_report,normalize_answers,answer_separator
+    aliases={}
+    sessions={}
+    participation=0
+    correct=0
+    _current_session=None
+
+    participation_column=None
+    correctness_column=None
+    total_column=None
+    ignore_responses=[]
+    ignore_roster=[]
+    cache=".pollscore_cache"
+    snapshot=None
+    duplicates="error"
+    duplicate_report="duplicate_responses.csv"
+    normalize_answers=[]
+    answer_separator=";"
+    for name in required:
+        globals().pop(name,None)
+
+reset()
 
 def session(timestamp,answerlist=None):
     global _current_session,sessions
@@ -33,3 +54,67 @@ def question(label,answers=None,part=None,corr=None):
 
 def exec_config(string):
     exec(string,globals())
+
+def load(filename,required=required):
+    r"""Execute the configuration file ``filename``, starting from the default settings.
+
+    The configuration can also be given as a file-like object. Raises a RuntimeError if
+    any of the settings in ``required`` is missing.
+    """
+    reset()
+    if hasattr(filename,"read"):
+        config=filename.read()
+    else:
+        with open(filename) as f:
+            config=f.read()
+    exec_config(config)
+    missing=[name for name in required if name not in globals()]
+    if missing:
+        raise RuntimeError("Configuration does not specify {}".format(", ".join(missing)))
+
+def check(filename):
+    r"""Check the configuration file ``filename`` without looking at any poll reports.
+
+    Checks that the configuration executes, that all required settings are present, that
+    sessions do not overlap, and that scores and answers of questions are well-formed.
+    Returns a list of the problems found.
+    """
+    #only a configuration that does not execute stops the check; everything else is reported together
+    try:
+        load(filename,required=[])
+    except Exception as E:
+        return ["{}: {}".format(type(E).__name__,E)]
+    problems=[]
+    missing=[name for name in required if name not in globals()]
+    if missing:
+        problems.append("Configuration does not specify {}".format(", ".join(missing)))
+    if "domain" in globals():
+        domains=[domain] if isinstance(domain,str) else domain
+        if not isinstance(domains,(list,tuple)) or not domains or not all(isinstance(d,str) for d in domains):
+            problems.append("Domain should be a string or a list of strings: {!r}".format(domain))
+    if duplicates not in duplicate_policies:
+        problems.append("Unknown duplicate policy {!r}; use one of {}".format(duplicates,", ".join(duplicate_policies)))
+    try:
+        Canonicalizer(normalize_answers,answer_separator)
+    except (ValueError,TypeError) as E:
+        problems.append(str(E))
+    for name in ["participation","correct"]:
+        if not isinstance(globals()[name],(int,float)):
+            problems.append("Default score {} is not a number: {!r}".format(name,globals()[name]))
+    S=sorted(sessions,key=lambda s: (s.start,s.end))
+    for a,b in zip(S,S[1:]):
+        if not a < b:
+            problems.append("Sessions {} and {} overlap".format(a,b))
+    for s in S:
+        d=sessions[s]
+        if isinstance(d,tuple):
+            answers,part,corr=d
+            if not isinstance(answers,str):
+                problems.append("Session {} has answer list {!r}, which is not a string".format(s,answers))
+            continue
+        for label,(part,corr,answers) in d.items():
+            if not isinstance(part,(int,float)) or not isinstance(corr,(int,float)):
+                problems.append("Session {} question {} has non-numeric scores".format(s,label))
+            if answers is not None and not isinstance(answers,(str,set,frozenset,list,tuple)):
+                problems.append("Session {} question {} has answers {!r}, which is not a string or a collection".format(s,label,answers))
+    return problems
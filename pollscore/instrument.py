@@ -0,0 +1,68 @@
+import time
+import json
+import tracemalloc
+import contextlib
+
+class Profiler:
+    r"""Records wall time, CPU time, peak memory allocation, and result sizes of processing stages.
+
+    Stages can be nested; a nested stage is recorded with the path of its enclosing stages, and
+    the time and memory of a stage include those of the stages nested in it. Peak allocation is
+    measured with tracemalloc, relative to the memory allocated when the stage started. Tracing
+    slows down allocation-heavy stages considerably and so distorts their times; with
+    ``memory=False`` only times are measured, and "peak_bytes" is None.
+    """
+    def __init__(self,memory=True):
+        self.memory=memory
+        self.records=[]
+        self._stack=[]
+
+    @contextlib.contextmanager
+    def stage(self,name):
+        r"""Context manager measuring a stage. It yields the record for the stage, in which the
+        caller can set "rows" and "columns" to describe the size of the result."""
+        started_tracing=False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing=True
+        path="/".join([r["name"] for r in self._stack]+[name])
+        record={"name":name,"path":path,"depth":len(self._stack),"rows":None,"columns":None,"peak_bytes":None}
+        if self.memory:
+            current,peak=tracemalloc.get_traced_memory()
+            if self._stack:
+                #remember the peak of the enclosing stage before resetting it for this one
+                self._stack[-1]["_peak"]=max(self._stack[-1]["_peak"],peak)
+            tracemalloc.reset_peak()
+            record["_start"]=current
+            record["_peak"]=current
+        self._stack.append(record)
+        self.records.append(record)
+        wall=time.perf_counter()
+        cpu=time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"]=time.perf_counter()-wall
+            record["cpu_seconds"]=time.process_time()-cpu
+            self._stack.pop()
+            if self.memory:
+                peak=max(record.pop("_peak"),tracemalloc.get_traced_memory()[1])
+                record["peak_bytes"]=peak-record.pop("_start")
+                if self._stack:
+                    self._stack[-1]["_peak"]=max(self._stack[-1]["_peak"],peak)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def write(self,filename):
+        r"""Write the recorded stages, in the order in which they started, as JSON."""
+        with open(filename,"w") as f:
+            json.dump({"stages":self.records},f,indent=1)
+
+def describe(record,result):
+    r"""Set "rows" and "columns" of a stage record from the shape or length of the stage result."""
+    shape=getattr(result,"shape",None)
+    if shape is not None:
+        record["rows"]=int(shape[0])
+        record["columns"]=int(shape[1]) if len(shape) > 1 else None
+    elif isinstance(result,(dict,list,tuple)):
+        record["rows"]=len(result)
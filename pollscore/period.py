@@ -1,12 +1,82 @@
-import pandas as pd
 import datetime
-from pandas._libs.tslibs.timestamps import Timestamp
 import re
 
 Period_repr_regex=re.compile(r"Period\('([^']*)', '([^']*)'\)")
-very_short_timedelta=pd.to_timedelta("1ms")
+#ISO-style timestamps, which are parsed without the help of pandas
+timestamp_regex=re.compile(r"^\s*(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T](\d{1,2})(?::(\d{2})(?::(\d{2})(?:\.(\d{1,9}))?)?)?)?\s*$")
+#period lengths consisting of a multiple of a single unit
+freq_regex=re.compile(r"^\s*(\d*)\s*(D|h|H|min|T|s|S|ms|L|us|U|ns|N)\s*$")
+#canonical unit names, their lengths in nanoseconds, and the format of a start time at that resolution
+units={
+    "D": (86400*10**9,"{:%Y-%m-%d}"),
+    "h": (3600*10**9,"{:%Y-%m-%d %H:00}"),
+    "min": (60*10**9,"{:%Y-%m-%d %H:%M}"),
+    "s": (10**9,"{:%Y-%m-%d %H:%M:%S}"),
+    "ms": (10**6,"{:%Y-%m-%d %H:%M:%S}.{:03d}"),
+    "us": (10**3,"{:%Y-%m-%d %H:%M:%S}.{:06d}"),
+    "ns": (1,"{:%Y-%m-%d %H:%M:%S}.{:09d}"),
+}
+unit_aliases={"H":"h","T":"min","S":"s","L":"ms","U":"us","N":"ns"}
+epoch=datetime.datetime(1970,1,1)
+
+def parse_timestamp(string):
+    r"""Nanoseconds since the epoch and resolution (a key of ``units``) of an ISO-style timestamp string,
+    or None if the string is not of that form."""
+    m=timestamp_regex.match(string)
+    if m is None:
+        return None
+    year,month,day,hour,minute,second,fraction=m.groups()
+    t=datetime.datetime(int(year),int(month),int(day),int(hour or 0),int(minute or 0),int(second or 0))
+    ns=(t-epoch)//datetime.timedelta(microseconds=1)*1000
+    if fraction is not None:
+        ns+=int(fraction.ljust(9,"0"))
+        resolution="ms" if len(fraction) <= 3 else ("us" if len(fraction) <= 6 else "ns")
+    elif second is not None:
+        resolution="s"
+    elif minute is not None:
+        resolution="min"
+    elif hour is not None:
+        resolution="h"
+    else:
+        resolution="D"
+    return ns,resolution
+
+def parse_freq(string):
+    r"""Multiple and canonical unit of a period length such as "90min", or None if it is not of that form."""
+    m=freq_regex.match(string)
+    if m is None:
+        return None
+    n=int(m.group(1) or 1)
+    if n == 0:
+        return None
+    return n,unit_aliases.get(m.group(2),m.group(2))
+
+def format_start(ns,unit):
+    t=epoch+datetime.timedelta(microseconds=ns//1000)
+    if unit == "ms":
+        return units[unit][1].format(t,ns%10**9//10**6)
+    if unit == "us":
+        return units[unit][1].format(t,ns%10**9//10**3)
+    if unit == "ns":
+        return units[unit][1].format(t,ns%10**9)
+    return units[unit][1].format(t)
 
 class Period(object):
+    r"""Period of time, such as a session, with sortable and hashable instances.
+
+    Input is a string "<start>; <length>", or a start and a length (a pandas frequency
+    such as "90min" or "D"), or two datetimes delimiting the period. If no length is given,
+    it is inferred from the resolution of the start, so "2020-06-08" is a full day.
+
+    Start and end are stored as integers (nanoseconds since the epoch; the end is the last
+    nanosecond in the period), so comparisons, hashing, and membership tests are cheap.
+    Periods compare as less/greater only if they are disjoint.
+
+    ISO-style start times with lengths that are a multiple of a single unit (days down to
+    nanoseconds) are handled without importing pandas; anything else is left to ``pd.Period``.
+    """
+    __slots__=("start","end","_str","_hash")
+
     def __init__(self,a,b=None):
         if isinstance(a,str):
             T = a.split(";")
@@ -14,30 +84,88 @@ class Period(object):
                 if len(T) >2 or b is not None:
                     raise ValueError("Ambiguous specification of period length")
                 a,b=T
-            self.period=pd.Period(a,b)
-        elif isinstance(a,datetime.datetime) and isinstance(b,datetime.datetime):
-            delta = max(b-a,very_short_timedelta)
-            self.period=pd.Period(a,delta)
+        if not self._parse(a,b):
+            self._parse_pandas(a,b)
+        self._hash=hash((self.start,self.end))
+
+    def _parse(self,a,b):
+        r"""Set start, end, and string form without using pandas; return False if the input is not supported."""
+        if isinstance(a,str):
+            parsed=parse_timestamp(a)
+            if parsed is None:
+                return False
+            ns,resolution=parsed
+        elif isinstance(a,datetime.date) and not isinstance(a,datetime.datetime) and b is not None:
+            ns,resolution=(datetime.datetime(a.year,a.month,a.day)-epoch)//datetime.timedelta(microseconds=1)*1000,"D"
         else:
-            self.period=pd.Period(a,b)
-    def __contains__(self,t):
-        return self.period.start_time <= t <= self.period.end_time   
-    def __str__(self):
-        start,freq=Period_repr_regex.search(repr(self.period)).groups()
+            return False
+        if b is None:
+            n,unit=1,resolution
+        elif isinstance(b,str):
+            freq=parse_freq(b)
+            if freq is None:
+                return False
+            n,unit=freq
+        else:
+            return False
+        length=units[unit][0]
+        self.start=ns-ns%length
+        self.end=self.start+n*length-1
+        start=format_start(self.start,unit)
+        if n == 1 and unit in ("D","h"):
+            self._str=start
+        else:
+            self._str="{}; {}{}".format(start,n if n > 1 else "",unit)
+        return True
+
+    def _parse_pandas(self,a,b):
+        import pandas as pd
+        if isinstance(a,datetime.datetime) and isinstance(b,datetime.datetime):
+            delta = max(b-a,pd.to_timedelta("1ms"))
+            period=pd.Period(a,delta)
+        else:
+            period=pd.Period(a,b)
+        self.start=period.start_time.value
+        self.end=(period+1).start_time.value-1
+        start,freq=Period_repr_regex.search(repr(period)).groups()
         if freq[-1] == 'T': freq = freq[:-1]+"min"
         if freq[-1] == 'L': freq = freq[:-1]+"ms"
-        if freq == "D" or freq == "H":
-            return start
+        if freq == "D" or freq == "H" or freq == "h":
+            self._str=start
         else:
-            return "{}; {}".format(start,freq)
+            self._str="{}; {}".format(start,freq)
+
+    @property
+    def start_time(self):
+        import pandas as pd
+        return pd.Timestamp(self.start)
+    @property
+    def end_time(self):
+        import pandas as pd
+        return pd.Timestamp(self.end)
+
+    def __getstate__(self):
+        return (self.start,self.end,self._str)
+    def __setstate__(self,state):
+        self.start,self.end,self._str=state
+        self._hash=hash((self.start,self.end))
+
+    def __contains__(self,t):
+        if not isinstance(t,int):
+            import pandas as pd
+            t=pd.Timestamp(t).value
+        return self.start <= t <= self.end
+    def __str__(self):
+        return self._str
     def __repr__(self):
-        s=str(self)
-        return "Period('{}')".format(s)
+        return "Period('{}')".format(self._str)
     def __lt__(self,other):
-        return self.period.end_time < other.period.start_time
+        return self.end < other.start
     def __gt__(self,other):
-        return self.period.start_time > other.period.end_time
+        return self.start > other.end
     def __hash__(self):
-        return hash(self.period)
+        return self._hash
     def __eq__(self,other):
-        return self.period == other.period
+        if not isinstance(other,Period):
+            return NotImplemented
+        return self.start == other.start and self.end == other.end
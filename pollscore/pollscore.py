@@ -1,26 +1,40 @@
 import pandas as pd
+import numpy as np
 import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pollscore.period import Period
 import pollscore.confmod as confmod
-from io import StringIO
+from pollscore.cache import ReportCache
+from pollscore.answers import Canonicalizer
+from pollscore.instrument import describe
+from io import StringIO, BytesIO
+import re
+import functools
+import contextlib
 
 roster_ID="SIS Login ID"
 PointsPossibleID='000-PointsPossible'
+subtable_header_regex=re.compile(r"^#,User Name,User Email,Submitted Date/Time,(?:.*,)?(.*)$",re.MULTILINE)
 
 class Question:
     r"""Class for storing questions and scoring their responses
     
     Input requires session, label, participation score, correctness score, and
-    a set of answers accepted as correct.
+    a set of answers accepted as correct. If a :class:`~pollscore.answers.Canonicalizer`
+    is given as ``canonical``, answers are compared by their canonical forms, and
+    ``correct_answers`` stores the canonical forms of the accepted answers.
     """
-    def __init__(self, session, label, particip_score, correct_score, correct_answers):
+    def __init__(self, session, label, particip_score, correct_score, correct_answers, canonical=None):
         self.session=session
         self.label=label
         self.particip_score=particip_score
         self.correct_score=correct_score
         if correct_score>0 and len(correct_answers) == 0:
             raise ValueError("Cannot specify score for correct answer if no correct answers are specified")
-        self.correct_answers=correct_answers
+        self.canonical=canonical
+        self.correct_answers=correct_answers if canonical is None else set(canonical.map(correct_answers))
     def __repr__(self):
         return "Question {} of {}".format(self.label,self.session)
 
@@ -35,6 +49,8 @@ class Question:
     def correctness_score(self,answer):
         r"""Determines correctness score of an answer
         """
+        if self.canonical is not None:
+            answer=self.canonical(answer)
         if answer in self.correct_answers:
             return self.correct_score
         else:
@@ -45,269 +61,760 @@ class Question:
         """
         if answer is None or pd.isna(answer) or answer == "":
             return 0
+        if self.canonical is not None:
+            answer=self.canonical(answer)
         if answer in self.correct_answers:
             return self.particip_score+self.correct_score
         else:
             return self.particip_score
         
+def open_report(f):
+    r"""Text handle for a poll report given as a file name, as bytes, or as a binary or text file-like object.
+
+    Line endings are translated as when opening a file, so "\r\n" reads as "\n" from buffers as well.
+    """
+    if isinstance(f,bytes):
+        return StringIO(f.decode('utf-8-sig'),newline=None)
+    if hasattr(f,"read"):
+        text=f.read()
+        return StringIO(text.decode('utf-8-sig') if isinstance(text,bytes) else text.lstrip('\ufeff'),newline=None)
+    return open(f,encoding='utf-8-sig')
+
+def read_report(f,name=None):
+    r"""Read a poll report into a table with columns "email", "time", "question", and "answer".
+
+    The report can be given as a file name, as bytes, or as a file-like object. Error messages
+    refer to the report by ``name``, which defaults to the file name, or "<in-memory report>".
+    """
+    if name is None:
+        name="file '{}'".format(f) if is_path(f) else "<in-memory report>"
+    #zoom poll reports have two different formats: from 2021 they start withguan
+    #"Poll Report" and then have several introductory lines before the header
+    #line for the response table occurs. Before, the header line was the first one.
+    #we check for either and then flush all lines up to and including the
+    #header line.
+    #zoom poll reports have insufficient columns in the header line,
+    #which throws off pandas autodetect.
+    #other formats would need to be supported here separately.
+    with open_report(f) as handle:
+        line = handle.readline()
+
+        #basic format identifier from the first line
+        if line != "Poll Report\n" and line != "#,User Name,User Email,Submitted Date/Time,\n":
+            raise RuntimeError("Unrecognized poll report format in {}".format(name))
+        #we assume we're looking at a legal poll report. We need to look at a line lower down
+        #to further determine the version.
+        while not line.startswith("#,User Name,User Email,Submitted Date/Time"):
+            if not line:
+                raise RuntimeError("No poll response header found in {}".format(name))
+            line = handle.readline()
+
+        #split according to versions
+        if line == "#,User Name,User Email,Submitted Date/Time,\n":
+            #Pre Sept. 20, 2021 format does not list question number in header, so the header ends with a comma
+            #the responses are (question,answer) pairs.
+            table = pd.read_csv(handle,header=None,usecols=[2,3,4,5],
+                    names=["email","time","question","answer"],parse_dates=["time"],
+                    na_filter=False)
+        else:
+            #Post Sept. 20, 2021 the CSV table actually consists of 1 or more subtables, each with their own
+            #header line with the question in it. We locate all header lines in one scan and then parse
+            #the whole remainder in a single pass. The header lines come out as rows with "#" in the first
+            #column, which we use to tag each response with the question of the subtable it belongs to.
+            text = line + handle.read()
+            questions = [m.group(1) for m in subtable_header_regex.finditer(text)]
+            table = pd.read_csv(
+                StringIO(text),
+                header=None,
+                usecols=[0,2,3,4],
+                names=["#","email","time","answer"],
+                dtype=str,
+                na_filter=False,
+            )
+            headers = (table["#"] == "#").to_numpy()
+            if headers.sum() != len(questions):
+                raise RuntimeError("Inconsistent subtable headers in {}".format(name))
+            question = np.array(questions,dtype=object)[headers.cumsum()-1]
+            table = table[~headers].drop("#",axis=1)
+            table["time"] = pd.to_datetime(table["time"])
+            table["question"] = question[~headers]
+            table.reset_index(drop=True,inplace=True)
+        #normalize email case in the event people have used variants
+        table.email = table.email.str.lower()
+        return table
+
+def report_from_frame(table):
+    r"""Poll report table from a DataFrame with (at least) columns "email", "time", "question", and "answer",
+    normalized as in :func:`read_report`."""
+    missing=[c for c in ["email","time","question","answer"] if c not in table.columns]
+    if missing:
+        raise ValueError("Poll report table lacks columns {}".format(", ".join(missing)))
+    table=table[["email","time","question","answer"]].reset_index(drop=True)
+    return table.assign(email=table["email"].str.lower(),time=pd.to_datetime(table["time"]),answer=table["answer"].fillna(""))
+
+def is_path(f):
+    r"""Whether ``f`` is a file name, as opposed to a table or buffer held in memory."""
+    return isinstance(f,(str,os.PathLike))
+
+def file_signature(f):
+    r"""Path, size, and modification time of a file, for recognizing unchanged files."""
+    st=os.stat(f)
+    return (os.path.abspath(f),st.st_size,st.st_mtime_ns)
+
+def session_indices(times,sessions):
+    r"""Positions in the sorted list of disjoint sessions of the sessions containing the given times.
+
+    The times are given as a numpy datetime64 array. Times outside all sessions get index -1.
+    """
+    if not sessions:
+        return np.full(len(times),-1)
+    starts=np.array([s.start for s in sessions],dtype="int64")
+    ends=np.array([s.end for s in sessions],dtype="int64")
+    t=times.astype('datetime64[ns]').view('int64')
+    index=np.searchsorted(starts,t,side='right')-1
+    inside=(index >= 0) & (t <= ends[index.clip(0)])
+    return np.where(inside,index,-1)
+
+def shared_categories(table):
+    r"""The categories of the columns of ``table`` if they are all categorical with the same categories, and None otherwise."""
+    categories=None
+    for dtype in table.dtypes:
+        if not isinstance(dtype,pd.CategoricalDtype):
+            return None
+        if categories is None:
+            categories=dtype.categories
+        elif not categories.equals(dtype.categories):
+            return None
+    return categories
+
+def canonical_codes(codes,uniques,canonical):
+    r"""Codes into the distinct canonical forms of the answers, for codes into the array ``uniques`` of distinct answers.
+
+    Only the distinct answers are canonicalized; the codes are then mapped over all responses.
+    Code -1, for a missing response, is kept.
+    """
+    new_codes,canonical_uniques=pd.factorize(np.array(canonical.map(uniques),dtype=object))
+    return np.append(new_codes,-1)[codes],canonical_uniques
+
+def score_matrices(responses,scorers,canonical=None):
+    r"""Participation, correctness, and total scores for a response table, given a dictionary of scorers.
+
+    Answers are replaced by integer codes into the array of distinct answers. Per question, a lookup array
+    over these codes records which answers are accepted as correct, so that all three score matrices
+    follow from array indexing, without any per-response python calls. If a canonicalizer is given as
+    ``canonical``, correctness is determined by the canonical forms of the answers.
+    """
+    labels=list(scorers.keys())
+    columns=responses[labels].columns
+    uniques=shared_categories(responses[labels])
+    if uniques is not None:
+        #compact response tables already store answers as codes into shared categories
+        codes=np.column_stack([responses[l].cat.codes.to_numpy() for l in labels])
+    else:
+        codes,uniques=pd.factorize(responses[labels].to_numpy(dtype=object).ravel())
+        codes=codes.reshape(len(responses),len(labels))
+    uniques=np.asarray(uniques,dtype=object)
+    #code -1 stands for a missing response. It picks out the last entry of the lookup arrays, which is False.
+    nonempty=np.append(uniques != "",False)
+    answered=nonempty[codes]
+    if canonical is not None:
+        codes,uniques=canonical_codes(codes,uniques,canonical)
+    code_position={u:i for i,u in enumerate(uniques)}
+    correct=np.zeros((len(labels),len(uniques)+1),dtype=bool)
+    for j,l in enumerate(labels):
+        for a in scorers[l].correct_answers:
+            i=code_position.get(a)
+            if i is not None:
+                correct[j,i]=True
+    is_correct=correct[np.arange(len(labels)),codes]
+    particip_score=np.array([scorers[l].particip_score for l in labels])
+    correct_score=np.array([scorers[l].correct_score for l in labels])
+    participation=np.where(answered,particip_score,0)
+    correctness=np.where(is_correct,correct_score,0)
+    totals=participation+np.where(answered & is_correct,correct_score,0)
+    return tuple(pd.DataFrame(m,index=responses.index,columns=columns) for m in (participation,correctness,totals))
+
+def response_scores(responses,scorers,session=None,canonical=None):
+    r"""Participation, correctness, and total scores of individual responses, given a dictionary of scorers.
+
+    ``responses`` is a table in long format, with columns "session", "question", and "answer". The scores
+    follow the same rules as :func:`score_matrices`, but are computed per response, so that a subset of
+    the responses can be scored without building the response table. If all responses are from one
+    session, it can be given as ``session``, which saves hashing the session of every response.
+    Answers are compared by their canonical forms if a canonicalizer is given as ``canonical``.
+    """
+    question_codes,questions=pd.factorize(responses["question"].to_numpy(dtype=object))
+    if session is not None:
+        key_codes=question_codes
+        keys=[(session,q) for q in questions]
+    else:
+        session_column=responses["session"]
+        if isinstance(session_column.dtype,pd.CategoricalDtype):
+            session_codes,sessions=session_column.cat.codes.to_numpy(),session_column.cat.categories
+        else:
+            session_codes,sessions=pd.factorize(session_column.to_numpy(dtype=object))
+        key_codes,pairs=pd.factorize(session_codes.astype("int64")*len(questions)+question_codes)
+        keys=[(sessions[k//len(questions)],questions[k%len(questions)]) for k in pairs]
+    answer_codes,answers=pd.factorize(responses["answer"].to_numpy(dtype=object))
+    answered=(answer_codes >= 0) & (np.asarray(answers,dtype=object) != "")[answer_codes]
+    if canonical is not None:
+        answer_codes,answers=canonical_codes(answer_codes,answers,canonical)
+    question_scorers=[scorers[k] for k in keys]
+    particip_score=np.array([q.particip_score for q in question_scorers]+[0])
+    correct_score=np.array([q.correct_score for q in question_scorers]+[0])
+    #pairs (question, answer) of correct responses, encoded as single integers
+    answer_position={a:i for i,a in enumerate(answers)}
+    correct_pairs=[k*len(answers)+answer_position[a] for k,q in enumerate(question_scorers)
+        for a in q.correct_answers if a in answer_position]
+    is_correct=(answer_codes >= 0) & np.isin(key_codes*len(answers)+answer_codes,correct_pairs)
+    participation=np.where(answered,particip_score[key_codes],0)
+    correctness=np.where(is_correct,correct_score[key_codes],0)
+    totals=participation+np.where(answered & is_correct,correct_score[key_codes],0)
+    return pd.DataFrame({"participation":participation,"correctness":correctness,"total":totals},index=responses.index)
+
+def write_csv(table,filename):
+    r"""Write ``table`` to the csv file ``filename``, atomically.
+
+    Rows are streamed to a temporary file in the same directory, which then replaces ``filename``,
+    so that readers never see a partially written file.
+    """
+    tmp=os.fspath(filename)+".tmp"
+    with open(tmp,"w",newline="") as f:
+        table.to_csv(f,index=False)
+    os.replace(tmp,filename)
+
+def changed_rows(table,previous,columns):
+    r"""Boolean array marking the rows of the roster table ``table`` whose values in ``columns`` differ
+    from those of the row with the same roster ID in the table ``previous``, or that do not occur there."""
+    if not set(columns).issubset(previous.columns):
+        return np.ones(len(table),dtype=bool)
+    previous=previous[previous[roster_ID].notna()].drop_duplicates(roster_ID).set_index(roster_ID)
+    old=previous.reindex(table[roster_ID].to_numpy())[columns].apply(pd.to_numeric,errors="coerce").to_numpy(dtype=float)
+    new=table[columns].apply(pd.to_numeric,errors="coerce").to_numpy(dtype=float)
+    differ=(old != new) & ~(np.isnan(old) & np.isnan(new))
+    return differ.any(axis=1)
+
+class PollInput:
+    r"""Descriptor for the attributes of a Poll that cached stages are computed from.
+
+    Assigning a new value discards the cached results of all stages depending on the attribute.
+    Values should be replaced rather than modified in place, since in-place changes go unnoticed.
+    """
+    def __set_name__(self,owner,name):
+        self.name=name
+    def __get__(self,obj,objtype=None):
+        if obj is None:
+            return self
+        return obj.__dict__[self.name]
+    def __set__(self,obj,value):
+        obj.__dict__[self.name]=value
+        obj.invalidate(self.name)
+
+def cached_stage(method):
+    r"""Decorator for Poll methods that compute a stage. The result is cached until
+    an input or stage it depends on changes (see ``Poll.stage_dependencies``)."""
+    name=method.__name__
+    @functools.wraps(method)
+    def stage(self):
+        try:
+            return self._stages[name]
+        except KeyError:
+            pass
+        with self.profile(name) as record:
+            result=method(self)
+            describe(record,result)
+        self._stages[name]=result
+        return result
+    return stage
+
 class Poll:
     r"""Object to store and analyze poll responses across multiple sessions.
     
     Constructor expects a file name of an appropriately formatted configuration file.
+    Parsed poll reports are cached in the directory configured as ``cache``, unless
+    ``use_cache`` is false. Report files are parsed using ``jobs`` processes; with
+    ``jobs=0`` one process per CPU is used.
+
+    With ``compact=True``, emails, questions, answers, and sessions are stored as categoricals,
+    which greatly reduces the memory used by the report and the response table.
+
+    If a :class:`~pollscore.instrument.Profiler` is given as ``profiler``, then time and memory use
+    of all processing stages are recorded in it.
+
+    Derived tables are cached. Reassigning one of the input attributes, such as
+    ``reportfiles``, ``config_sessions``, or ``aliases``, discards exactly the cached
+    results that depend on it. In addition, response and score tables are cached per
+    session, so that after a change in the reports only the sessions whose responses
+    changed are processed again.
     """
-    def __init__(self,config_filename):
-        confmod.sessions={}
-        confmod.aliases={}
-        with open(config_filename) as f:
-            config=f.read()
-        confmod.exec_config(config)
-        #determine the poll report files that need to be considered
-        if isinstance(confmod.pollreports,str):
-            reportfiles=glob.glob(confmod.pollreports)
-        else:
-            reportfiles=sum( (glob.glob(f) for f in confmod.pollreports),[])
+    #inputs and stages each cached stage is computed from
+    stage_dependencies={
+        'parsed_reports': {'reportfiles'},
+        'session_report': {'parsed_reports','config_sessions','duplicates'},
+        'response_table': {'session_report'},
+        'scorers': {'session_report','config_sessions','canonical_answers'},
+        'fullroster': {'rosterfile'},
+        'match': {'session_report','fullroster','domain','aliases','ignore_responses','ignore_roster'},
+        'score_tables': {'response_table','scorers'},
+        'matched_roster': {'match','fullroster'},
+        'score_totals': {'session_report','scorers'},
+        'roster_table': {'match','matched_roster','score_totals','scorers'},
+        'response_index': {'session_report'},
+    }
+    reportfiles=PollInput()
+    rosterfile=PollInput()
+    domain=PollInput()
+    aliases=PollInput()
+    ignore_responses=PollInput()
+    ignore_roster=PollInput()
+    config_sessions=PollInput()
+    duplicates=PollInput()
+    canonical_answers=PollInput()
 
-        domain=confmod.domain
-        aliases={ k: v if v.endswith(domain) else v+domain for k,v in confmod.aliases.items()}
+    def __init__(self,config_filename,use_cache=True,jobs=1,compact=False,profiler=None,reports=None,roster=None):
+        self._stages={}
+        self.profiler=profiler
+        #parsed tables by file signature, only kept while watching for changed reports
+        self._parsed={}
+        self._keep_parsed=False
+        self._session_cache={}
+        #reports and roster held in memory take the place of the configured files
+        in_memory=reports is not None
+        confmod.load(config_filename,["domain"] if in_memory else confmod.required)
+        domains=[confmod.domain] if isinstance(confmod.domain,str) else list(confmod.domain)
+        #emails in reports are compared in lower case; aliases may refer to a bare login id
+        aliases={ k.lower(): (v if "@" in v else v+domains[0]).lower() for k,v in confmod.aliases.items()}
 
-        self.reportfiles=reportfiles
-        self.rosterfile=confmod.roster
-        self.uploadfile=confmod.upload
+        self.pollreports=getattr(confmod,"pollreports",[])
+        self.reportfiles=list(reports) if in_memory else self.find_reportfiles()
+        self.rosterfile=roster if in_memory else confmod.roster
+        self.uploadfile=getattr(confmod,"upload",None)
+        if confmod.snapshot or self.uploadfile is None:
+            self.snapshotfile=confmod.snapshot
+        else:
+            self.snapshotfile="{}-snapshot{}".format(*os.path.splitext(self.uploadfile))
+        self.cache=ReportCache(confmod.cache) if (use_cache and confmod.cache and not in_memory) else None
+        self.jobs=jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.compact=compact
 
-        self.domain=confmod.domain
+        self.domain=domains
         self.aliases=aliases
-        self.ignore_responses=set(confmod.ignore_responses)
+        self.ignore_responses={e.lower() for e in confmod.ignore_responses}
         self.ignore_roster=set(confmod.ignore_roster)
 
         self.config_sessions=confmod.sessions
-        self._response_tab=None
+        self.duplicates=confmod.duplicates
+        self.duplicate_report=confmod.duplicate_report
+        self.canonical_answers=Canonicalizer(confmod.normalize_answers,confmod.answer_separator) if confmod.normalize_answers else None
         self._question_order=None
-        self._scorer=None
-        self._matches=None
-        self._roster=None
-        self.rosterfile=confmod.roster
+        self._question_times=None
         self._particip_default=confmod.participation
         
         self._participation_column=confmod.participation_column
         self._correctness_column=confmod.correctness_column
         self._total_column=confmod.total_column
- 
-    def response_table(self):
-        r"""Total table of responses.
-        
-        Rows are indexed by the participant emails. Columns are multi-indexed by session
-        (given by a time period) and a poll label. It is an error to have multiple responses
-        from a participant to the same question in the same session. Sessions are part of the configuration.
-        In addition, the routine here will make up day-long sessions for responses that are not part of a
-        configured session. If there are multiple sessions on one day, then this automatic mechanism can lead
-        to error reports. The work-around is to configure appropriate sessions. This is usually required anyway for specifying
+
+    @classmethod
+    def from_frames(cls,config,reports,roster,**kwargs):
+        r"""Poll for reports and a roster that are held in memory rather than in files.
+
+        ``config`` is a configuration file name or a file-like object with the configuration; it
+        need not specify ``pollreports``, ``roster``, or ``upload``. ``reports`` is a list of poll
+        reports, each given as a table with columns "email", "time", "question", and "answer", or as
+        the contents of a report file (bytes or a file-like object). ``roster`` is the roster as a
+        table of strings (as read by ``pd.read_csv(..., dtype=str)``), or as the contents of a
+        roster file. Buffers are read only once. Further keyword arguments are passed to the
+        constructor. Use :meth:`submission_table` or ``write_submission(file=...)`` to obtain the
+        result without writing to the configured upload file.
+        """
+        return cls(config,reports=reports,roster=roster,**kwargs)
+
+    def invalidate(self,name):
+        r"""Discard cached results of all stages depending on the input or stage ``name``."""
+        if name in ('config_sessions','canonical_answers'):
+            #per-session results are keyed by the responses in the session, but depend on configuration as well
+            self._session_cache.clear()
+        for stage,dependencies in self.stage_dependencies.items():
+            if name in dependencies:
+                self._stages.pop(stage,None)
+                self.invalidate(stage)
+
+    def profile(self,name):
+        r"""Context manager recording ``name`` as a stage in the profiler, if there is one."""
+        if self.profiler is None:
+            return contextlib.nullcontext({})
+        return self.profiler.stage(name)
+
+    def find_reportfiles(self):
+        r"""The poll report files matching the configured ``pollreports`` patterns."""
+        #determine the poll report files that need to be considered
+        if isinstance(self.pollreports,str):
+            return glob.glob(self.pollreports)
+        else:
+            return sum( (glob.glob(f) for f in self.pollreports),[])
+
+    def read_reports(self):
+        r"""Parsed tables of the report files, in the same order as ``self.reportfiles``.
+
+        While :meth:`watch` runs, tables of files that are unchanged since they were last read
+        are reused. Otherwise, they are taken from the cache where possible. The remaining files
+        are parsed in a pool of ``self.jobs`` worker processes. Reports held in memory, as DataFrames
+        or buffers, are converted directly.
+        """
+        files=self.reportfiles
+        signatures=[file_signature(f) if is_path(f) else None for f in files]
+        tables=[self._parsed.get(sig) if sig is not None else
+            (report_from_frame(f) if isinstance(f,pd.DataFrame) else read_report(f,"<in-memory report {}>".format(i)))
+            for i,(f,sig) in enumerate(zip(files,signatures))]
+        if self.cache is not None:
+            tables=[self.cache.get(f) if t is None else t for f,t in zip(files,tables)]
+        missing=[i for i,t in enumerate(tables) if t is None]
+        jobs=min(self.jobs,len(missing))
+        if jobs > 1:
+            with ProcessPoolExecutor(jobs) as pool:
+                parsed=list(pool.map(read_report,[files[i] for i in missing]))
+        else:
+            parsed=[read_report(files[i]) for i in missing]
+        for i,t in zip(missing,parsed):
+            tables[i]=t
+            if self.cache is not None:
+                self.cache.put(files[i],t)
+        if self.cache is not None:
+            self.cache.save()
+        if self._keep_parsed:
+            self._parsed={sig:t for sig,t in zip(signatures,tables) if sig is not None}
+        return tables
+
+    @cached_stage
+    def parsed_reports(self):
+        r"""All parsed poll reports, concatenated into one table."""
+        with self.profile("read_reports") as record:
+            tables=self.read_reports()
+            describe(record,tables)
+        with self.profile("concat") as record:
+            poll_report=pd.concat(tables,ignore_index=True)
+            describe(record,poll_report)
+        if self.compact:
+            poll_report=poll_report.astype({"email":"category","question":"category","answer":"category"})
+        return poll_report
+
+    @cached_stage
+    def session_report(self):
+        r"""Table of all responses, with a column "session" assigning each response to a session.
+
+        Sessions are part of the configuration. In addition, the routine here will make up day-long
+        sessions for responses that are not part of a configured session. If there are multiple
+        sessions on one day, then this automatic mechanism can lead to error reports. The work-around
+        is to configure appropriate sessions. This is usually required anyway for specifying
         answers that are accepted as correct.
+
+        Assigning sessions, ordering questions, resolving duplicates, and fingerprinting sessions
+        are passes over all responses, also when only some reports changed. Only the parsing of
+        reports and the scoring of sessions are limited to what changed.
         """
-        if self._response_tab is not None:
-            return self._response_tab
-            
         #we collect all poll reports in one dataframe for further analysis
-        poll_report=[]
-        for f in self.reportfiles:
-            #zoom poll reports have two different formats: from 2021 they start withguan
-            #"Poll Report" and then have several introductory lines before the header
-            #line for the response table occurs. Before, the header line was the first one.
-            #we check for either and then flush all lines up to and including the
-            #header line.
-            #zoom poll reports have insufficient columns in the header line,
-            #which throws off pandas autodetect.
-            #other formats would need to be supported here separately.
-            with open(f,encoding='utf-8-sig') as handle:
-                line = handle.readline()
-
-                #basic format identifier from the first line
-                if line != "Poll Report\n" and line != "#,User Name,User Email,Submitted Date/Time,\n":
-                    raise RuntimeError("Unrecognized poll report format in file '{}'".format(f))
-                #we assume we're looking at a legal poll report. We need to look at a line lower down
-                #to further determine the version.
-                while not line.startswith("#,User Name,User Email,Submitted Date/Time"):
-                    if not line:
-                        raise RuntimeError("No poll response header found in file '{}'".format(f))
-                    line = handle.readline()
-
-                #split according to versions
-                if line == "#,User Name,User Email,Submitted Date/Time,\n":
-                    #Pre Sept. 20, 2021 format does not list question number in header, so the header ends with a comma
-                    #the responses are (question,answer) pairs.
-                    table = pd.read_csv(handle,header=None,usecols=[2,3,4,5],
-                            names=["email","time","question","answer"],parse_dates=["time"],
-                            na_filter=False)
-                else:
-                    #Post Sept. 20, 2021 the CSV table actually consists of 1 or more subtables, each with their own
-                    #header line with the question in it. We split our input into these subtables
-                    #and parse them separately.
-                    buffer=[]
-                    table=[]
-                    question = line[line.rindex(",")+1:-1]
-                    while True:
-                        line = handle.readline()
-                        if line.startswith('#,User Name,User Email,Submitted Date/Time,') or not(line):
-                            subtable = pd.read_csv(
-                                StringIO(''.join(buffer)),
-                                header=None,
-                                usecols=[2,3,4],
-                                names=["email","time","answer"],
-                                parse_dates=["time"],
-                                na_filter=False,
-                            )
-                            buffer = []
-                            subtable['question']=question
-                            table.append(subtable)
-                            if line:
-                                question = line[line.rindex(",")+1:-1]
-                            else:
-                                break #EOF
-                        else:
-                            buffer.append(line)
-                    table = pd.concat(table,ignore_index=True)
-                #normalize email case in the event people have used variants
-                table.email = table.email.str.lower()
-                poll_report.append(table)
-        poll_report=pd.concat(poll_report,ignore_index=True)
-        self.poll_report=poll_report
+        poll_report=self.parsed_reports().copy()
         #next: determine sessions. Take sessions from configuration
         sessions=sorted(set(self.config_sessions.keys()))
         if not all(sessions[i]<sessions[i+1] for i in range(len(sessions)-1)):
             raise RuntimeError("Sessions are not disjoint")
 
-        poll_report.set_index(['time'],inplace=True)
-        poll_report.sort_index(inplace=True)
-        poll_report['session']=None
-        for s in sessions:
-            poll_report.loc[s.period.start_time:s.period.end_time,'session']=s
-            
-        while True:
-            unassigned = poll_report.loc[poll_report['session'].isnull()]
-            if len(unassigned) == 0: break
-            s=Period(unassigned.iloc[0].name.date(),"D")
-            print("Found response outside session. Creating {}.".format(s))
-            sessions.append(s)
-            sessions.sort()
-            if not all(sessions[i]<sessions[i+1] for i in range(len(sessions)-1)):
-                raise RuntimeError("Sessions are not disjoint")
-            poll_report.loc[s.period.start_time:s.period.end_time,'session']=s
-           
-        poll_report.reset_index(inplace=True)
-
-        all_questions=poll_report.groupby(["session","question"])
-        questions_startstop=pd.DataFrame(
-            {"min":all_questions['time'].min().rename("min"),
-             "max":all_questions['time'].max().rename("max")})
-        question_periods=questions_startstop.apply(lambda a: Period(*a),axis=1)
-        question_order={s: list(q.sort_values().reset_index()['question']) for s,q in question_periods.groupby("session")}
-        try:
-            response_table=[ql.set_index(["session","question","email"])['answer'].unstack('session').unstack("question") for s, ql in poll_report.groupby(["session"])]
-        except ValueError as E:
-            dup = poll_report.duplicated({'email','question','session'},keep=False)
-            print("Duplicate entries found\n-------------")
-            print(poll_report[dup])
-            print("-------------")
-            raise ValueError("Probably multiple responses with same participant, session, and question.") from E
-        response_table=pd.concat(response_table,axis=1,join='outer',sort=True)
-        response_table.index.rename('email',inplace=True)
-        index=[]
-        for s in list(sessions):
-            if s in question_order:
-                for q in question_order[s]:
-                    index.append((s,q))
+        #assign sessions in one pass over the sorted response times. Responses outside configured
+        #sessions get day-long sessions, which are created all at once.
+        with self.profile("assign sessions"):
+            poll_report.sort_values('time',kind='mergesort',inplace=True)
+            #position of each response in the reports, for the "first" and "last" duplicate policies
+            report_order=poll_report.index.to_numpy()
+            poll_report.reset_index(drop=True,inplace=True)
+            times=poll_report['time'].to_numpy(dtype='datetime64[ns]')
+            index=session_indices(times,sessions)
+            unassigned=index < 0
+            if unassigned.any():
+                days=np.unique(times[unassigned].astype('datetime64[D]'))
+                new_sessions=[Period(pd.Timestamp(d).date(),"D") for d in days]
+                for s in new_sessions:
+                    print("Found response outside session. Creating {}.".format(s))
+                sessions=sorted(sessions+new_sessions)
+                if not all(sessions[i]<sessions[i+1] for i in range(len(sessions)-1)):
+                    raise RuntimeError("Sessions are not disjoint")
+                index=session_indices(times,sessions)
+            if self.compact:
+                poll_report['session']=pd.Categorical.from_codes(index,pd.Index(sessions,dtype=object))
             else:
-                print("Dropping session {} because it registered no responses.".format(s))
-                sessions.remove(s)
-        response_table=response_table[index]
-        
+                poll_report['session']=np.array(sessions+[None],dtype=object)[index]
+
+        #questions are ordered by the time of their first response, and then of their last one. Grouping
+        #is done on the integer session codes, so that no session objects are hashed or compared.
+        with self.profile("question order"):
+            responses=pd.DataFrame({"session":index,"question":poll_report['question'].to_numpy(dtype=object),"time":poll_report['time'].to_numpy()})
+            question_times=responses.groupby(["session","question"],sort=False)['time'].agg(["min","max"])
+            question_times=question_times.set_axis(["start","end"],axis=1).reset_index()
+            question_times.sort_values(["session","start","end"],kind='mergesort',ignore_index=True,inplace=True)
+            question_order={sessions[code]: list(q) for code,q in question_times.groupby("session",sort=False)['question']}
+            question_times["session"]=np.array(sessions,dtype=object)[question_times["session"].to_numpy()]
+            for s in list(sessions):
+                if s not in question_order:
+                    print("Dropping session {} because it registered no responses.".format(s))
+                    sessions.remove(s)
+
+        with self.profile("duplicates"):
+            poll_report=self.resolve_duplicates(poll_report,index,report_order,sessions,question_order)
+
+        #the rows of each session, and a fingerprint of its responses, which determines
+        #whether cached per-session results are still valid
+        with self.profile("fingerprints"):
+            row_hashes=pd.util.hash_pandas_object(poll_report[["email","time","question","answer"]],index=False)
+            by_session=row_hashes.groupby(poll_report['session'].to_numpy(),sort=False)
+            self._session_rows=by_session.indices
+            self._session_fingerprints={s:(len(h),int(h.sum())) for s,h in by_session}
+
+        self.poll_report=poll_report
         self.sessions=sessions
         self._question_order=question_order
-        self._response_tab=response_table
-        return self._response_tab
+        self._question_times=question_times
+        return poll_report
+
+    def resolve_duplicates(self,poll_report,session_codes,report_order,sessions,question_order):
+        r"""Remove multiple responses from a participant to the same question in the same session.
+
+        Duplicates are found in one pass over the time-sorted report, with sessions given by their
+        integer codes ``session_codes``. Which response is kept depends on the ``duplicates`` policy:
+        "first" and "last" keep the first and last in the order of the reports (``report_order``),
+        "latest-by-time" the one submitted last, and "best-score" the one with the highest total
+        score (the later one if tied). With the policy "error", a ValueError is raised instead.
+        All duplicate responses are written to ``duplicate_report``.
+        """
+        if self.duplicates not in confmod.duplicate_policies:
+            raise ValueError("Unknown duplicate policy '{}'; use one of {}".format(self.duplicates,", ".join(confmod.duplicate_policies)))
+        keys=pd.DataFrame({"email":poll_report['email'].to_numpy(),"session":session_codes,"question":poll_report['question'].to_numpy()})
+        dup=keys.duplicated(keep=False).to_numpy()
+        if not dup.any():
+            return poll_report
+        duplicates=poll_report[dup]
+        #the report lists the duplicates grouped by participant, session, and question, in order of time
+        report_rows=keys[dup].sort_values(['email','session','question'],kind='mergesort').index
+        if self.duplicates == "error":
+            write_csv(duplicates.loc[report_rows],self.duplicate_report)
+            print("Found {} responses from a participant to a question answered more than once. They are listed in {}.".format(len(duplicates),self.duplicate_report))
+            raise ValueError("Probably multiple responses with same participant, session, and question. Configure a duplicates policy to resolve them.")
+        #order the duplicate responses by increasing preference, and keep the last one of each group
+        if self.duplicates == "first":
+            preference=np.argsort(-report_order[dup],kind='stable')
+        elif self.duplicates == "last":
+            preference=np.argsort(report_order[dup],kind='stable')
+        elif self.duplicates == "latest-by-time":
+            preference=np.arange(len(duplicates))
+        else:
+            scorers=self.build_scorers([s for s in sessions if s in question_order],question_order,verbose=False)
+            preference=np.argsort(response_scores(duplicates,scorers,canonical=self.canonical_answers)["total"].to_numpy(),kind='stable')
+        superseded=np.empty(len(duplicates),dtype=bool)
+        superseded[preference]=keys[dup].iloc[preference].duplicated(keep='last').to_numpy()
+        drop=np.flatnonzero(dup)[superseded]
+        write_csv(duplicates.assign(kept=~superseded).loc[report_rows],self.duplicate_report)
+        print("Found {} responses from a participant to a question answered more than once. Kept one per question by policy '{}', dropping {}. They are listed in {}.".format(
+            len(duplicates),self.duplicates,len(drop),self.duplicate_report))
+        return poll_report.drop(drop).reset_index(drop=True)
+
+    def session_data(self,s):
+        r"""Dictionary of cached results for session ``s``, valid as long as the responses in the session do not change."""
+        fingerprint=self._session_fingerprints[s]
+        entry=self._session_cache.get(s)
+        if entry is None or entry[0] != fingerprint:
+            entry=(fingerprint,{})
+            self._session_cache[s]=entry
+        return entry[1]
+
+    def session_responses(self,s):
+        r"""Table of responses for session ``s``, indexed by participant email, with columns multi-indexed by session and question."""
+        poll_report=self.session_report()
+        data=self.session_data(s)
+        if "responses" not in data:
+            ql=poll_report.iloc[self._session_rows[s]]
+            table=ql.set_index(["session","question","email"])['answer'].unstack('session').unstack("question")
+            data["responses"]=table[[(s,q) for q in self._question_order[s]]]
+        return data["responses"]
+
+    def session_scores(self,s):
+        r"""Table of participation, correctness, and total scores for session ``s``, summed per participant email.
+
+        The session can also be given as a string, see :meth:`find_session`.
+        """
+        s=self.find_session(s)
+        data=self.session_data(s)
+        if "scores" not in data:
+            ql=self.poll_report.iloc[self._session_rows[s]]
+            scores=response_scores(ql,self.scorers(),s,self.canonical_answers)
+            data["scores"]=scores.groupby(ql['email'].to_numpy()).sum().rename_axis('email')
+        return data["scores"]
+
+    def find_session(self,s):
+        r"""The session ``s``, which may also be given as a string or Period that equals a session or falls within one."""
+        self.session_report()
+        if not isinstance(s,Period):
+            s=Period(s)
+        if s in self._session_fingerprints:
+            return s
+        for t in self.sessions:
+            if s.start in t:
+                return t
+        raise KeyError("No session {}".format(s))
+
+    @cached_stage
+    def response_index(self):
+        r"""Table of all responses, indexed by participant email, session, and question, and sorted on that index.
+
+        Responses of one participant form a contiguous block, so that they can be looked up without
+        building the response table.
+        """
+        poll_report=self.session_report()
+        return poll_report[["email","session","question","time","answer"]].set_index(["email","session","question"]).sort_index()
+
+    def student_responses(self,email):
+        r"""Table of the responses of the participant with the given email, indexed by session and question.
+
+        Besides the time and answer of each response, the table has columns with its participation,
+        correctness, and total score. Only the responses of the participant are scored.
+        """
+        index=self.response_index()
+        email=email.lower()
+        if email in index.index.levels[0]:
+            responses=index.loc[email]
+        else:
+            responses=index.iloc[:0].droplevel("email")
+        scores=response_scores(responses.reset_index(),self.scorers(),canonical=self.canonical_answers)
+        return pd.concat([responses,scores.set_axis(responses.index)],axis=1)
+
+    def question_stats(self,session,label):
+        r"""Table of the answers given to question ``label`` of ``session``.
+
+        Rows are indexed by the distinct answers, and columns give the number of responses with that
+        answer, whether the answer is accepted as correct, and the score for it.
+        """
+        s=self.find_session(session)
+        poll_report=self.session_report()
+        responses=poll_report.iloc[self._session_rows[s]]
+        responses=responses[(responses["question"] == label).to_numpy()]
+        if len(responses) == 0:
+            raise KeyError("No responses to question {} of session {}".format(label,s))
+        counts=responses["answer"].astype(object).value_counts(dropna=False).rename("responses")
+        answers=pd.DataFrame({"session":s,"question":label,"answer":counts.index})
+        scores=response_scores(answers,self.scorers(),s,self.canonical_answers)
+        stats=pd.concat([counts.reset_index(drop=True),scores],axis=1).set_axis(counts.index)
+        stats.insert(1,"correct",stats["correctness"] > 0)
+        stats.index.rename("answer",inplace=True)
+        return stats
+
+    @cached_stage
+    def response_table(self):
+        r"""Total table of responses.
+        
+        Rows are indexed by the participant emails. Columns are multi-indexed by session
+        (given by a time period) and a poll label. Multiple responses from a participant to the
+        same question in the same session are resolved by :meth:`resolve_duplicates`. See
+        :meth:`session_report` for how responses are assigned to sessions.
+        """
+        self.session_report()
+        with self.profile("unstack"):
+            tables=[self.session_responses(s) for s in self.sessions]
+        with self.profile("concat"):
+            response_table=pd.concat(tables,axis=1,join='outer',sort=True)
+        response_table.index.rename('email',inplace=True)
+        return response_table
 
     def question_order(self):
         r"""Returns a dictionary with sessions as keys and as values the list of questions chronologically ordered by responses
         """
-        if self._question_order is None:
-            self.response_table()
+        self.session_report()
         return self._question_order
 
+    def question_times(self):
+        r"""Table with a row for every question of every session, with columns "session", "question",
+        and the times "start" and "end" of the first and last response to it, in the order of :meth:`question_order`.
+        """
+        self.session_report()
+        return self._question_times
+
+    @cached_stage
     def match(self):
         r"""Match participant emails with roster entries
         
+        Emails are resolved through the aliases, stripped of one of the configured domains, and
+        joined with the (case-insensitive) login ids of the roster, all as vectorized operations.
         returns answer as a dictionary with entries <email>:<roster ID>
         """
-        if self._matches is not None:
-            return self._matches
-        roster=pd.read_csv(self.rosterfile,dtype=str)
-        I = next(i for i,n in enumerate(roster["Student"]) if isinstance(n,str) and n.strip() == "Points Possible")
-        roster=roster.drop(range(I+1))
-        roster_ids=set(roster[roster_ID])
-        domain_emails={id+self.domain for id in roster_ids if id not in self.ignore_roster}
-        strip=-len(self.domain)
-        def match(email):
-            if email in self.ignore_responses:
-                return ''
-            email = self.aliases.get(email) or email
-            if email.lower() in domain_emails:
-                return email[:strip].lower()
-            else:
-                return ''
-        emails=set(self.response_table().index)
-        matches={email:match(email) for email in self.response_table().index}
-        matches={e:id for e,id in matches.items() if id}
-        
-        unmatched_emails=emails.difference(matches.keys()).difference(self.ignore_responses)
-        unmatched_ids=roster_ids.difference(matches.values()).difference(self.ignore_roster)
+        roster=self.fullroster()
+        ids=roster[roster_ID].dropna()
+        ids=ids[~ids.isin(self.ignore_roster)]
+        logins=pd.Series(ids.to_numpy(),index=ids.str.lower().to_numpy())
+        logins=logins[~logins.index.duplicated()]
+
+        emails=pd.Index(pd.unique(self.session_report()['email'].astype(object)),dtype=object)
+        resolved=pd.Series(emails.str.lower(),index=emails,dtype=object)
+        resolved=resolved[~resolved.isin(self.ignore_responses)]
+        resolved=resolved.map(self.aliases).fillna(resolved)
+        domain_regex="^(.*)(?:{})$".format("|".join(re.escape(d.lower()) for d in self.domain))
+        matched=resolved.str.extract(domain_regex,expand=False).map(logins).dropna()
+        matches=matched.to_dict()
+
+        unmatched_emails=emails.difference(matched.index)
+        unmatched_emails=unmatched_emails[~unmatched_emails.str.lower().isin(self.ignore_responses)]
+        unmatched_ids=pd.Index(ids).difference(pd.Index(matched.to_numpy()))
 
         if len(unmatched_emails) == 1:
-            print("Found 1 unmatched email in responses: {}".format(next(iter(unmatched_emails))))
+            print("Found 1 unmatched email in responses: {}".format(unmatched_emails[0]))
         elif len(unmatched_emails) > 1:
                 print("Found {} unmatched emails in responses: {}".format(len(unmatched_emails),sorted(unmatched_emails)))
 
         if len(unmatched_ids) == 1:
-            print("Found 1 roster id without matched responses: {}".format(next(iter(unmatched_ids))))
+            print("Found 1 roster id without matched responses: {}".format(unmatched_ids[0]))
         elif len(unmatched_ids) > 1:
             print("Found {} roster ids without matched responses: {}".format(len(unmatched_ids),sorted(unmatched_ids)))
-        self._roster=roster
-        self._matches=matches
         return matches
         
+    @cached_stage
     def fullroster(self):
-        r"""full roster table as read in from the relevant csv"""
-        if self._roster is None:
-            self.matches()
-        return self._roster
+        r"""full roster table as read in from the relevant csv, or given as a table or buffer. Rows up to and including "Points Possible" are dropped."""
+        if isinstance(self.rosterfile,pd.DataFrame):
+            roster=self.rosterfile.astype(str).where(self.rosterfile.notna())
+        else:
+            roster=pd.read_csv(BytesIO(self.rosterfile) if isinstance(self.rosterfile,bytes) else self.rosterfile,dtype=str)
+        header=np.flatnonzero(roster["Student"].str.strip().to_numpy() == "Points Possible")
+        return roster.iloc[header[0]+1 if len(header) else 0:]
         
+    @cached_stage
     def scorers(self):
         r"""returns dictionary of scorers for the poll questions
         """
-        if self._scorer is not None:
-            return self._scorer
+        return self.build_scorers(self.sessions,self.question_order())
+
+    def build_scorers(self,sessions,question_order,verbose=True):
+        r"""dictionary of scorers for the questions in ``question_order`` of the given sessions.
+
+        Problems with the configured scoring are reported if ``verbose`` is true.
+        """
         scorer={}
-        question_order=self.question_order()
-        for s in self.sessions:
+        for s in sessions:
             d=self.config_sessions.get(s,{})
             if isinstance(d,tuple):
                 answers=d[0].split(',')
                 question_labels=question_order[s]
                 if len(answers) > len(question_labels):
-                    print("Session {} has more correct answers specified than questions. Only using first {} answers specified.".
+                    if verbose: print("Session {} has more correct answers specified than questions. Only using first {} answers specified.".
                         format(s,len(question_labels)))
                     answers=answers[:len(question_labels)]
-                scorer.update({(s,l):Question(s,l,d[1],d[2] if a else 0,set(a)) for l,a in zip(question_labels,answers)})
+                scorer.update({(s,l):Question(s,l,d[1],d[2] if a else 0,set(a),self.canonical_answers) for l,a in zip(question_labels,answers)})
                 if len(answers) < len(question_labels):
-                    print("Session {} has insufficient answers specified. Scoring last {} only for participation.".format(s,len(question_labels)-len(answers)))
-                    scorer.update({(s,l):Question(s,l,d[1],0,set()) for l in question_labels[len(answers):]})
+                    if verbose: print("Session {} has insufficient answers specified. Scoring last {} only for participation.".format(s,len(question_labels)-len(answers)))
+                    scorer.update({(s,l):Question(s,l,d[1],0,set(),self.canonical_answers) for l in question_labels[len(answers):]})
             if isinstance(d,dict):
                 with_answers=set(d.keys())
                 with_responses=set(question_order[s])
                 no_responses=with_answers.difference(with_responses)
                 no_answers=with_responses.difference(with_answers)
                 if len(no_responses) > 0:
-                    print("Session {} questions without responses, but scoring specified: {}.".format(s,no_responses))
+                    if verbose: print("Session {} questions without responses, but scoring specified: {}.".format(s,no_responses))
                 if len(no_answers) > 0:
-                    print("Session {} questions {} have responses but no scoring. Scoring {} points for participation only.".format(s,sorted(no_answers),self._particip_default))
+                    if verbose: print("Session {} questions {} have responses but no scoring. Scoring {} points for participation only.".format(s,sorted(no_answers),self._particip_default))
                 for l in question_order[s]:
                     if l in no_answers:
                         particip_score, correct_score, answers=(self._particip_default, 0, set())
@@ -317,28 +824,43 @@ class Poll:
                             answers={}
                         elif isinstance(answers,str):
                             answers={answers}
-                    scorer[(s,l)]=Question(s,l,particip_score,correct_score,answers)
-        self._scorer=scorer
+                    scorer[(s,l)]=Question(s,l,particip_score,correct_score,answers,self.canonical_answers)
         return scorer
         
+    @cached_stage
+    def score_tables(self):
+        r"""produce participation, correctness, and total score tables in one pass.
+
+        Returns a triple of tables with rows indexed by participant emails and columns all the poll questions.
+        """
+        return score_matrices(self.response_table(),self.scorers(),self.canonical_answers)
+
     def participation_table(self):
         r"""produce a table with rows indexed by partipant emails and columns all the poll questions. Values are participation scores"""
-        responses=self.response_table()
-        scorers=self.scorers()
-        return pd.DataFrame({l:responses[l].map(s.participation_score) for l,s in scorers.items()})
+        return self.score_tables()[0]
 
     def correctness_table(self):
         r"""produce a table with rows indexed by partipant emails and columns all the poll questions. Values are correctness scores"""
-        responses=self.response_table()
-        scorers=self.scorers()
-        return pd.DataFrame({l:responses[l].map(s.correctness_score) for l,s in scorers.items()})
+        return self.score_tables()[1]
 
     def totals_table(self):
         r"""produce a table with rows indexed by partipant emails and columns all the poll questions. Values are total scores"""
-        responses=self.response_table()
-        scorers=self.scorers()
-        return pd.DataFrame({l:responses[l].map(s.total_score) for l,s in scorers.items()})
+        return self.score_tables()[2]
         
+    @cached_stage
+    def score_totals(self):
+        r"""produce a table with rows indexed by participant emails and columns "participation", "correctness", and "total", summed over all poll questions.
+
+        Responses are scored in long format, without building the response table, so memory use grows
+        with the number of responses rather than with the number of participants times questions.
+        Scores are summed per session and cached, so only sessions with changed responses are scored again.
+        """
+        self.session_report()
+        totals=pd.concat([self.session_scores(s) for s in self.sessions]).groupby(level=0).sum()
+        totals.index.rename('email',inplace=True)
+        return totals
+
+    @cached_stage
     def matched_roster(self):
         r"""produce a table representing the matched entries from the roster. Also includes a "points possible" row."""
         match=self.match()
@@ -348,6 +870,7 @@ class Poll:
         matchroster.sort_index(inplace=True)
         return matchroster
         
+    @cached_stage
     def roster_table(self):
         r"""produce a score table in roster format. This is a roster table with some/all columns for participation, correctness, and total score.
         
@@ -356,24 +879,25 @@ class Poll:
         """
         matchdict=self.match()
         matchroster=self.matched_roster()
+        totals=self.score_totals()
         columns_to_add=[]
         if self._participation_column:
-            scores=self.participation_table().sum(axis=1).rename(self._participation_column).reset_index()
-            scores[roster_ID]=scores['email'].map(matchdict.get)
+            scores=totals['participation'].rename(self._participation_column).reset_index()
+            scores[roster_ID]=scores['email'].map(matchdict)
             scores=scores[~scores[roster_ID].isnull()].drop("email",axis=1).set_index(roster_ID)
             max_score=sum(s.particip_score for s in self.scorers().values())
             scores.loc[PointsPossibleID]=max_score
             columns_to_add.append(scores)
         if self._correctness_column:
-            scores=self.correctness_table().sum(axis=1).rename(self._correctness_column).reset_index()
-            scores[roster_ID]=scores['email'].map(matchdict.get)
+            scores=totals['correctness'].rename(self._correctness_column).reset_index()
+            scores[roster_ID]=scores['email'].map(matchdict)
             scores=scores[~scores[roster_ID].isnull()].drop("email",axis=1).set_index(roster_ID)
             max_score=sum(s.correct_score for s in self.scorers().values())
             scores.loc[PointsPossibleID]=max_score
             columns_to_add.append(scores)
         if self._total_column:
-            scores=self.totals_table().sum(axis=1).rename(self._total_column).reset_index()
-            scores[roster_ID]=scores['email'].map(matchdict.get)
+            scores=totals['total'].rename(self._total_column).reset_index()
+            scores[roster_ID]=scores['email'].map(matchdict)
             scores=scores[~scores[roster_ID].isnull()].drop("email",axis=1).set_index(roster_ID)
             max_score=sum(s.particip_score +s.correct_score for s in self.scorers().values())
             scores.loc[PointsPossibleID]=max_score
@@ -383,46 +907,120 @@ class Poll:
         cols=list(self.fullroster().columns) + [c.columns[0] for c in columns_to_add]
         return W[cols].sort_values(cols[0])
         
-    def write_submission(self):
-        r"""write csv file of the roster table, suitable for upload in CMS.
+    def max_scores(self):
+        r"""dictionary with the maximum score (the "points possible") for each of the configured score columns."""
+        maxscores=self.roster_table().iloc[0]
+        return {col: maxscores[col] for col in [self._participation_column, self._correctness_column, self._total_column] if col}
+
+    def submission_table(self,delta=False):
+        r"""The roster table as written by :meth:`write_submission`.
+
+        With ``delta=True``, only the rows of students whose scores differ from those recorded in the
+        snapshot file ``snapshotfile`` are included, together with the "Points Possible" row. The
+        snapshot only advances with :meth:`commit_snapshot`, so successive delta submissions
+        accumulate all changes since the last committed upload. Without a snapshot, all rows are included.
         """
         W=self.roster_table()
-        with open(self.uploadfile,"w") as f:
-            f.write(W.to_csv(index=False))
-            
-def main(*args):
-    import argparse
-
-    parser = argparse.ArgumentParser(description="Score Zoom poll reports for upload to a course management system.")
-    parser.add_argument("files", metavar="FILE", type=str, nargs='*',
-        help = "if specified, process given report files instead of configured ones.")
-    parser.add_argument("-c","--config", type=str, default='config', help = "config file (default 'config')")
-    args = parser.parse_args()
-
-    print("args:",args)
-    print("-----------\nPOLL SCORE PROCESSING\n-----------");
-    print('Processing poll configuration from file "{}"'.format(args.config))
-    P = Poll(args.config)
-    if args.files:
-        print("Report files overridden by command line argument. Working with: {}".format(args.files))
-        P.reportfiles = args.files
-    else:
-        print("Configured report files: {}".format(P.reportfiles))
-    print("Configured sessions: {}".format(sorted(P.config_sessions.keys())))
-    print("-----------\nRESPONSE PROCESSING\n-----------");
-    P.response_table()
-    print("-----------\nSCORING PROCESSING\n-----------");
-    P.scorers()
-    print("-----------\nMATCHING ROSTER\n-----------");
-    P.matched_roster()
-    print("-----------\nWRITING SCORE FILE\n-----------");
-    P.write_submission()
-    maxscores = P.roster_table().iloc[0]
-    for col in [P._participation_column, P._correctness_column, P._total_column]:
-        if col:
-            print("Maximum {}: {}".format(col,maxscores[col]))
-    print("Report in {} is ready for upload".format(P.uploadfile))
-    
+        if not delta:
+            return W
+        previous=self.snapshotfile if self.snapshotfile is not None and os.path.exists(self.snapshotfile) else None
+        columns=[c for c in [self._participation_column, self._correctness_column, self._total_column] if c]
+        if previous is None:
+            changed=np.ones(len(W),dtype=bool)
+        else:
+            changed=changed_rows(W,pd.read_csv(previous,dtype={roster_ID:str}),columns)
+        changed|=(W[roster_ID] == '').to_numpy()
+        print("Delta submission: {} of {} students have changed scores since {}".format(
+            int(changed.sum())-1,len(W)-1,previous or "the start"))
+        return W[changed]
+
+    def write_submission(self,delta=False,file=None):
+        r"""write csv file of the roster table, suitable for upload in CMS.
+
+        The table is written to ``file``, which can be a file name or a writable object, and
+        defaults to the configured upload file. Files are replaced atomically. With ``delta=True``,
+        only rows that changed since the last committed snapshot are written (see :meth:`submission_table`).
+        """
+        file=self.uploadfile if file is None else file
+        if file is None:
+            raise RuntimeError("No upload file configured")
+        if delta and self.snapshotfile is None:
+            raise RuntimeError("Delta submissions require a snapshot file")
+        W=self.submission_table(delta)
+        with self.profile("write_submission") as record:
+            if hasattr(file,"write"):
+                W.to_csv(file,index=False)
+            else:
+                write_csv(W,file)
+            describe(record,W)
+
+    def commit_snapshot(self):
+        r"""Record the scores in the upload file as uploaded, by merging its rows into the snapshot file.
+
+        Call this after the submission file has been uploaded. Rows of the upload file replace
+        the snapshot rows with the same roster ID, so committing a delta submission records just
+        the uploaded changes. Later delta submissions are compared with the updated snapshot.
+        """
+        if self.uploadfile is None or self.snapshotfile is None:
+            raise RuntimeError("Committing a snapshot requires an upload file and a snapshot file")
+        if not os.path.exists(self.uploadfile):
+            raise RuntimeError("No submission file {} to commit".format(self.uploadfile))
+        uploaded=pd.read_csv(self.uploadfile,dtype={roster_ID:str})
+        if os.path.exists(self.snapshotfile):
+            snapshot=pd.concat([pd.read_csv(self.snapshotfile,dtype={roster_ID:str}),uploaded],ignore_index=True)
+            snapshot=snapshot.drop_duplicates(roster_ID,keep="last")
+        else:
+            snapshot=uploaded
+        write_csv(snapshot,self.snapshotfile)
+        print("Committed {} rows of {} to snapshot {}".format(len(uploaded),self.uploadfile,self.snapshotfile))
+
+    def watch(self,interval=5,patterns=True,delta=False):
+        r"""Rescore whenever report files change, rewriting the submission file each time.
+
+        Report files are found by matching the configured ``pollreports`` patterns every
+        ``interval`` seconds (or, if ``patterns`` is false, by checking the current ``reportfiles``),
+        and compared by size and modification time. Only new or changed reports are parsed,
+        and only sessions with changed responses are rescored; the other steps of
+        :meth:`session_report` still go over all responses. With ``delta=True``, the submission
+        file is written as by ``write_submission(delta=True)``, so it holds all changes since the last
+        committed snapshot. Runs until interrupted.
+        """
+        signatures={f:file_signature(f) for f in self.reportfiles}
+        self._keep_parsed=True
+        try:
+            while True:
+                time.sleep(interval)
+                files=self.find_reportfiles() if patterns else list(self.reportfiles)
+                try:
+                    current={f:file_signature(f) for f in files}
+                except FileNotFoundError:
+                    continue
+                if current == signatures:
+                    continue
+                changed=sorted(f for f in current if signatures.get(f) != current[f])
+                removed=sorted(f for f in signatures if f not in current)
+                print("-----------\nREPORTS CHANGED ({})\n-----------".format(time.strftime("%Y-%m-%d %H:%M:%S")))
+                if changed:
+                    print("New or changed report files: {}".format(changed))
+                if removed:
+                    print("Removed report files: {}".format(removed))
+                signatures=current
+                try:
+                    self.reportfiles=files
+                    self.write_submission(delta)
+                except Exception as E:
+                    print("Processing failed: {}: {}".format(type(E).__name__,E))
+                    continue
+                for col,score in self.max_scores().items():
+                    print("Maximum {}: {}".format(col,score))
+                print("Report in {} is updated".format(self.uploadfile))
+        except KeyboardInterrupt:
+            print("Stopped watching for report changes.")
+        finally:
+            self._keep_parsed=False
+            self._parsed={}
+
+from pollscore.cli import main
 
 if __name__ == "__main__":
     main()
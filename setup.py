@@ -22,9 +22,9 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.9',
     entry_points={
-        'console_scripts': ['pollscore=pollscore.pollscore:main'],
+        'console_scripts': ['pollscore=pollscore.cli:main','pollscore-batch=pollscore.batch:main'],
     },
 )
 